@@ -1,11 +1,11 @@
 """
 Database Helper Functions
 
-MongoDB helper functions ready to use in your backend code.
+Async MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -21,12 +21,36 @@ db = None
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
-if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+
+def init_db():
+    """Create the Motor client on the running event loop (call from app lifespan)."""
+    global _client, db
+    if database_url and database_name:
+        # Size the pool explicitly instead of relying on the driver default of
+        # 100 sockets; bounded waits keep p99 stable when the pool is saturated.
+        _client = AsyncIOMotorClient(
+            database_url,
+            maxPoolSize=50,
+            minPoolSize=10,
+            waitQueueTimeoutMS=2000,
+            serverSelectionTimeoutMS=3000,
+            retryWrites=True,
+        )
+        db = _client[database_name]
+    return db
+
+
+def close_db():
+    """Close the Motor client and release its connection pool."""
+    global _client, db
+    if _client is not None:
+        _client.close()
+    _client = None
+    db = None
+
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -40,16 +64,16 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
+
     cursor = db[collection_name].find(filter_dict or {})
     if limit:
         cursor = cursor.limit(limit)
-    
-    return list(cursor)
+
+    return await cursor.to_list(length=None)
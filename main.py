@@ -1,39 +1,61 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from pymongo import ReturnDocument
 
-from database import db, create_document, get_documents
+from database import init_db, close_db
 
-app = FastAPI(title="Restaurant App API")
+db = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db
+    db = init_db()
+    if db is not None:
+        # Warm the pool so the first request doesn't pay connection/auth latency
+        await db.command("ping")
+    await seed_data()
+    yield
+    close_db()
+
+
+app = FastAPI(title="Restaurant App API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=[os.getenv("FRONTEND_ORIGIN", "http://localhost:3000")],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type", "authorization"],
+    max_age=86400,
 )
 
 
 # ---------- Utils ----------
-from bson import ObjectId
+from bson import ObjectId, json_util
+from bson.codec_options import CodecOptions
+from bson.errors import InvalidId
+from bson.raw_bson import RawBSONDocument
 
 
 def to_str_id(doc: dict) -> dict:
     if not doc:
         return doc
-    d = doc.copy()
-    if "_id" in d:
-        d["id"] = str(d.pop("_id"))
-    # convert nested ObjectIds if any
-    for k, v in list(d.items()):
-        if isinstance(v, ObjectId):
-            d[k] = str(v)
-    return d
+    # single pass: rename _id -> id and stringify any ObjectId values
+    return {
+        ("id" if k == "_id" else k): (str(v) if isinstance(v, ObjectId) else v)
+        for k, v in doc.items()
+    }
 
 
 # ---------- Schemas ----------
@@ -47,6 +69,8 @@ class VerifyOtpRequest(BaseModel):
 
 
 class RestaurantOut(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True, revalidate_instances="never")
+
     id: str
     name: str
     description: Optional[str] = None
@@ -57,6 +81,8 @@ class RestaurantOut(BaseModel):
 
 
 class ProductOut(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True, revalidate_instances="never")
+
     id: str
     title: str
     description: Optional[str] = None
@@ -66,13 +92,86 @@ class ProductOut(BaseModel):
     tags: Optional[List[str]] = []
 
 
+# Projections matching the output schemas, so Mongo ships only fields we return
+RESTAURANT_PROJECTION = {"name": 1, "description": 1, "address": 1, "image": 1, "rating": 1, "cuisine": 1}
+PRODUCT_PROJECTION = {"title": 1, "description": 1, "price": 1, "image": 1, "restaurant_id": 1, "tags": 1}
+
+# $project stages for the list endpoints: the server renames _id to a string id,
+# so documents arrive already in API shape and need no Python post-processing
+RESTAURANT_PROJECT_STAGE = {"$project": {"_id": 0, "id": {"$toString": "$_id"}, **RESTAURANT_PROJECTION}}
+PRODUCT_PROJECT_STAGE = {"$project": {"_id": 0, "id": {"$toString": "$_id"}, **PRODUCT_PROJECTION}}
+
+
+# Raw-BSON codec for the list path: result documents stay as C-decoded raw
+# buffers instead of being materialized into dicts, and json_util re-emits
+# them as JSON directly; the $project stages guarantee JSON-native fields only
+_RAW_CODEC = CodecOptions(document_class=RawBSONDocument)
+
+
+def raw_collection(name: str):
+    return db.get_collection(name, codec_options=_RAW_CODEC)
+
+
+def encode_doc_list(docs: list) -> bytes:
+    return json_util.dumps(docs).encode("utf-8")
+
+
+def json_list_response(docs: list) -> Response:
+    return Response(content=encode_doc_list(docs), media_type="application/json")
+
+
+# Short-TTL cache of already-serialized list bodies; the catalog changes
+# rarely, so a cache hit skips the DB roundtrip, BSON decode and encoding.
+# On a cold key, the first request fetches and concurrent requests await the
+# same in-flight future (single flight), so N misses cost one DB query.
+_list_cache = TTLCache(maxsize=16, ttl=30)
+_list_inflight: dict = {}
+
+
+async def cached_json_list(key: str, fetch) -> Response:
+    body = _list_cache.get(key)
+    if body is None:
+        fut = _list_inflight.get(key)
+        if fut is not None:
+            body = await fut
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            _list_inflight[key] = fut
+            try:
+                body = encode_doc_list(await fetch())
+            except BaseException as exc:
+                fut.set_exception(exc)
+                raise
+            finally:
+                _list_inflight.pop(key, None)
+            _list_cache[key] = body
+            fut.set_result(body)
+    return Response(content=body, media_type="application/json")
+
+
 # ---------- Startup seed ----------
-@app.on_event("startup")
-def seed_data():
+async def seed_data():
     if db is None:
         return
-    # Seed restaurants
-    if db["restaurant"].count_documents({}) == 0:
+    # Indexes: keep restaurant menu lookups and phone upserts on IXSCAN
+    await db["product"].create_index("restaurant_id")
+    await db["user"].create_index("phone", unique=True)
+
+    # Every worker process runs the lifespan, so win an atomic seed marker
+    # first; find_one_and_update returns None only for the process whose
+    # upsert inserted it, and everyone else skips seeding
+    marker = await db["meta"].find_one_and_update(
+        {"_id": "seed"},
+        {"$setOnInsert": {"created_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    if marker is not None:
+        return
+
+    # Seed restaurants and their menu items in one pass; "is empty?" only needs
+    # a single-document probe, not an exact count_documents scan
+    if await db["restaurant"].find_one({}, {"_id": 1}) is None:
+        now = datetime.now(timezone.utc)
         restaurants = [
             {
                 "name": "Spice Garden",
@@ -81,8 +180,8 @@ def seed_data():
                 "image": "https://images.unsplash.com/photo-1544025162-d76694265947?q=80&w=1600&auto=format&fit=crop",
                 "rating": 4.6,
                 "cuisine": "Indian",
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "created_at": now,
+                "updated_at": now,
             },
             {
                 "name": "Pasta Piazza",
@@ -91,17 +190,15 @@ def seed_data():
                 "image": "https://images.unsplash.com/photo-1523986371872-9d3ba2e2f642?q=80&w=1600&auto=format&fit=crop",
                 "rating": 4.7,
                 "cuisine": "Italian",
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "created_at": now,
+                "updated_at": now,
             },
         ]
-        db["restaurant"].insert_many(restaurants)
+        res = await db["restaurant"].insert_many(restaurants, ordered=False)
+        # Map restaurant names to the ids just assigned, no extra find() round trip
+        rest_ids = dict(zip([r["name"] for r in restaurants], res.inserted_ids))
 
-    # Seed products (menu items)
-    if db["product"].count_documents({}) == 0:
-        # Map restaurants to ids
-        rest_docs = list(db["restaurant"].find())
-        rest_ids = {r["name"]: r["_id"] for r in rest_docs}
+        # Seed products (menu items)
         products = [
             {
                 "title": "Butter Chicken",
@@ -110,8 +207,8 @@ def seed_data():
                 "image": "https://images.unsplash.com/photo-1604909052743-88e0b01e6e8b?q=80&w=1600&auto=format&fit=crop",
                 "restaurant_id": str(rest_ids.get("Spice Garden")),
                 "tags": ["spicy", "non-veg"],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "created_at": now,
+                "updated_at": now,
             },
             {
                 "title": "Paneer Tikka",
@@ -120,8 +217,8 @@ def seed_data():
                 "image": "https://images.unsplash.com/photo-1625944528146-1b02d4ca9d24?q=80&w=1600&auto=format&fit=crop",
                 "restaurant_id": str(rest_ids.get("Spice Garden")),
                 "tags": ["veg", "grill"],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "created_at": now,
+                "updated_at": now,
             },
             {
                 "title": "Penne Arrabbiata",
@@ -130,21 +227,25 @@ def seed_data():
                 "image": "https://images.unsplash.com/photo-1473093295043-cdd812d0e601?q=80&w=1600&auto=format&fit=crop",
                 "restaurant_id": str(rest_ids.get("Pasta Piazza")),
                 "tags": ["veg", "pasta"],
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "created_at": now,
+                "updated_at": now,
             },
         ]
-        db["product"].insert_many(products)
+        await db["product"].insert_many(products, ordered=False)
 
 
 # ---------- Generic endpoints ----------
+# Fixed body, encoded once at import; health checks hit this constantly
+ROOT_BODY = orjson.dumps({"message": "Restaurant API running"})
+
+
 @app.get("/")
-def read_root():
-    return {"message": "Restaurant API running"}
+async def read_root():
+    return Response(content=ROOT_BODY, media_type="application/json")
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -160,7 +261,7 @@ def test_database():
             response["database_name"] = db.name if hasattr(db, "name") else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -172,7 +273,7 @@ def test_database():
 
 # ---------- Auth (Phone + OTP demo) ----------
 @app.post("/auth/send-otp")
-def send_otp(payload: SendOtpRequest):
+async def send_otp(payload: SendOtpRequest):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
     phone = payload.phone.strip()
@@ -181,88 +282,94 @@ def send_otp(payload: SendOtpRequest):
     # Demo OTP (in production, send via SMS provider)
     otp = "1234"
 
-    # Upsert user
-    user = db["user"].find_one({"phone": phone})
-    now = datetime.now(timezone.utc).isoformat()
-    if user:
-        db["user"].update_one({"_id": user["_id"]}, {"$set": {"is_verified": False, "last_login": now}})
-    else:
-        db["user"].insert_one(
-            {
-                "phone": phone,
-                "name": None,
-                "is_verified": False,
-                "last_login": now,
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
-            }
-        )
+    # Upsert user in a single round trip (phone comes from the filter on insert)
+    now = datetime.now(timezone.utc)
+    now_iso = now.isoformat()
+    await db["user"].find_one_and_update(
+        {"phone": phone},
+        {
+            "$set": {"is_verified": False, "last_login": now_iso, "updated_at": now},
+            "$setOnInsert": {"name": None, "created_at": now},
+        },
+        upsert=True,
+    )
 
     # Return OTP in response for demo
     return {"success": True, "otp": otp, "message": "OTP generated. Use 1234 for demo."}
 
 
 @app.post("/auth/verify")
-def verify_otp(payload: VerifyOtpRequest):
+async def verify_otp(payload: VerifyOtpRequest):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
     phone = payload.phone.strip()
     if payload.otp != "1234":
         raise HTTPException(status_code=400, detail="Invalid OTP")
-    user = db["user"].find_one({"phone": phone})
+    user = await db["user"].find_one_and_update(
+        {"phone": phone},
+        {"$set": {"is_verified": True, "updated_at": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER,
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db["user"].update_one({"_id": user["_id"]}, {"$set": {"is_verified": True, "updated_at": datetime.now(timezone.utc)}})
-    return {"success": True, "user": to_str_id(db["user"].find_one({"_id": user["_id"]}))}
+    return {"success": True, "user": to_str_id(user)}
 
 
 # ---------- Restaurants ----------
-@app.get("/restaurants", response_model=List[RestaurantOut])
-def list_restaurants():
+@app.get("/restaurants")
+async def list_restaurants():
     if db is None:
         return []
-    docs = list(db["restaurant"].find())
-    return [RestaurantOut(**to_str_id(d)) for d in docs]
+    return await cached_json_list(
+        "restaurants",
+        lambda: raw_collection("restaurant").aggregate([RESTAURANT_PROJECT_STAGE]).to_list(length=None),
+    )
 
 
 @app.get("/restaurants/{restaurant_id}", response_model=RestaurantOut)
-def get_restaurant(restaurant_id: str):
+async def get_restaurant(restaurant_id: str):
     if db is None:
         raise HTTPException(status_code=404, detail="Not found")
     try:
-        doc = db["restaurant"].find_one({"_id": ObjectId(restaurant_id)}) if ObjectId.is_valid(restaurant_id) else db["restaurant"].find_one({"_id": restaurant_id})
-    except Exception:
-        doc = None
+        key = ObjectId(restaurant_id)
+    except InvalidId:
+        key = restaurant_id
+    doc = await db["restaurant"].find_one({"_id": key}, RESTAURANT_PROJECTION)
     if not doc:
         raise HTTPException(status_code=404, detail="Restaurant not found")
     return RestaurantOut(**to_str_id(doc))
 
 
-@app.get("/restaurants/{restaurant_id}/products", response_model=List[ProductOut])
-def get_restaurant_products(restaurant_id: str):
+@app.get("/restaurants/{restaurant_id}/products")
+async def get_restaurant_products(restaurant_id: str):
     if db is None:
         return []
-    docs = list(db["product"].find({"restaurant_id": restaurant_id}))
-    return [ProductOut(**to_str_id(d)) for d in docs]
+    docs = await raw_collection("product").aggregate(
+        [{"$match": {"restaurant_id": restaurant_id}}, PRODUCT_PROJECT_STAGE]
+    ).to_list(length=None)
+    return json_list_response(docs)
 
 
 # ---------- Products ----------
-@app.get("/products", response_model=List[ProductOut])
-def list_products():
+@app.get("/products")
+async def list_products():
     if db is None:
         return []
-    docs = list(db["product"].find())
-    return [ProductOut(**to_str_id(d)) for d in docs]
+    return await cached_json_list(
+        "products",
+        lambda: raw_collection("product").aggregate([PRODUCT_PROJECT_STAGE]).to_list(length=None),
+    )
 
 
 @app.get("/products/{product_id}", response_model=ProductOut)
-def get_product(product_id: str):
+async def get_product(product_id: str):
     if db is None:
         raise HTTPException(status_code=404, detail="Not found")
     try:
-        doc = db["product"].find_one({"_id": ObjectId(product_id)}) if ObjectId.is_valid(product_id) else db["product"].find_one({"_id": product_id})
-    except Exception:
-        doc = None
+        key = ObjectId(product_id)
+    except InvalidId:
+        key = product_id
+    doc = await db["product"].find_one({"_id": key}, PRODUCT_PROJECTION)
     if not doc:
         raise HTTPException(status_code=404, detail="Product not found")
     return ProductOut(**to_str_id(doc))
@@ -271,4 +378,12 @@ def get_product(product_id: str):
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        log_level="warning",
+    )